@@ -1,8 +1,9 @@
 from chromadb.api.models import Collection
-from chromadb.utils.embedding_functions import (
-    OpenAIEmbeddingFunction,
-    SentenceTransformerEmbeddingFunction
-)
+from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+from functools import lru_cache
+from openai import AsyncOpenAI
+from operator import attrgetter
+import asyncio
 import chromadb
 import os
 from typing import Iterator, Literal, TypeVar
@@ -21,19 +22,44 @@ class EmbeddingNotFoundException(Exception):
     pass
 
 
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+# Number of documents sent to OpenAI in a single embeddings request
+OPENAI_EMBEDDING_CHUNK_SIZE = 64
+# Number of records added to chromadb collection in a single call
+CHROMA_ADD_BATCH_SIZE = 200
+
 EmbeddingType = Literal["openai", "huggingface"]
 DataType = Literal["embeddings", "documents", "similarities", "nouns"]
 # Represents any type for Iterator, in this case embeddings or documents
 T = TypeVar("T")
 
 
+@lru_cache(maxsize=1)
+def get_chroma_client() -> chromadb.ClientAPI:
+    """
+    Returns a persistent chromadb client stored in the ``app/chroma`` directory.
+
+    The client is created once and cached, so the database and its indices are not
+    reloaded on every collection lookup.
+
+    :return: The persistent chromadb client.
+    :rtype: chromadb.ClientAPI
+    """
+    root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+    chroma_db_path = f"{root_path}/app/chroma"
+    return chromadb.PersistentClient(path=chroma_db_path)
+
+
+@lru_cache(maxsize=4)
 def get_or_create_collection(embedding_type: EmbeddingType = "openai") -> Collection:
     """
     Retrieve or create a chroma database collection for storing embeddings based on
     the specified embedding type. This function initializes a persistent chromadb
     client, identifies the target embedding type, and generates a corresponding
     embedding function to register with the relevant collection. If the specified
-    embedding type is not recognized, an exception will be raised.
+    embedding type is not recognized, an exception will be raised. Collections are
+    cached per embedding type, so embedding functions (and the HuggingFace model)
+    are created only once.
 
     :param embedding_type: The type of embedding function to use. Accepted values are
         "openai" or "huggingface". Defaults to "openai".
@@ -44,10 +70,7 @@ def get_or_create_collection(embedding_type: EmbeddingType = "openai") -> Collec
     :raises EmbeddingTypeNotRecognizedException: If the provided ``embedding_type``
         is not recognized.
     """
-    # chromadb client
-    root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
-    chroma_db_path = f"{root_path}/app/chroma"
-    client = chromadb.PersistentClient(path=chroma_db_path)
+    client = get_chroma_client()
 
     if embedding_type == "openai":
         # wikipedia collection
@@ -55,11 +78,13 @@ def get_or_create_collection(embedding_type: EmbeddingType = "openai") -> Collec
         return client.get_or_create_collection(
             name="wikipedia-urls-content-data-openai",
             embedding_function=OpenAIEmbeddingFunction(
-                model_name="text-embedding-3-small",
+                model_name=OPENAI_EMBEDDING_MODEL,
                 api_key=api_key,
             )
         )
     elif embedding_type == "huggingface":
+        # imported here to avoid loading torch when only openai collection is used
+        from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
         # model_name="sentence-transformers/all-MiniLM-L6-v2"
         return client.get_or_create_collection(
             name="wikipedia-urls-content-data-bert",
@@ -87,7 +112,40 @@ def check_if_urls_in_collection(embedding_type: EmbeddingType) -> bool:
     """
     collection = get_or_create_collection(embedding_type=embedding_type)
     urls_ids = wikipedia_urls_hashed()
-    return True if len(collection.get(ids=urls_ids)["ids"]) == len(urls_ids) else False
+    # cheap count first, the collection cannot hold all urls if it has fewer records
+    if collection.count() < len(urls_ids):
+        return False
+    # only ids are needed, documents and metadatas are not fetched
+    return len(collection.get(ids=urls_ids, include=[])["ids"]) == len(urls_ids)
+
+
+async def create_openai_embeddings(documents: list[str]) -> list[list[float]]:
+    """
+    Creates OpenAI embeddings for the given documents concurrently.
+
+    Documents are split into chunks of ``OPENAI_EMBEDDING_CHUNK_SIZE`` and every chunk
+    is sent as a separate request using the async OpenAI client, so all requests are
+    in flight at the same time instead of being sent one after another.
+
+    :param documents: Texts to create embeddings for.
+    :type documents: list[str]
+    :return: Embeddings in the same order as the given documents.
+    :rtype: list[list[float]]
+    """
+    async with AsyncOpenAI(api_key=os.environ['OPENAI_API_KEY']) as client:
+        responses = await asyncio.gather(*[
+            client.embeddings.create(
+                model=OPENAI_EMBEDDING_MODEL,
+                input=documents[idx:idx + OPENAI_EMBEDDING_CHUNK_SIZE]
+            )
+            for idx in range(0, len(documents), OPENAI_EMBEDDING_CHUNK_SIZE)
+        ])
+    # embeddings are ordered by their index, as the order of response data is not guaranteed
+    return [
+        item.embedding
+        for response in responses
+        for item in sorted(response.data, key=attrgetter("index"))
+    ]
 
 
 async def create_embeddings() -> None:
@@ -96,8 +154,10 @@ async def create_embeddings() -> None:
 
     This function first retrieves URLs from the Wikipedia URL fetcher, then processes
     them using different embedding types. For each embedding type, a corresponding
-    collection is either retrieved or created. The URLs and their associated document
-    texts are then added to the respective collections.
+    collection is either retrieved or created. The URLs missing in the collection and
+    their associated document texts are then added to it in batches of
+    ``CHROMA_ADD_BATCH_SIZE``. OpenAI embeddings are created upfront with concurrent
+    requests, HuggingFace embeddings are created by chromadb.
 
     :raises KeyError: If the required keys are missing during URL fetching.
 
@@ -107,10 +167,22 @@ async def create_embeddings() -> None:
 
     for embedding_type in ("openai", "huggingface"):
         collection = get_or_create_collection(embedding_type=embedding_type)
-        collection.add(
-            ids=list(fetched_urls.keys()),
-            documents=list(fetched_urls.values()),
-        )
+        # skip urls already stored in the collection, they don't need to be embedded again
+        existing = set(collection.get(ids=list(fetched_urls.keys()), include=[])["ids"])
+        missing = {id: document for id, document in fetched_urls.items() if id not in existing}
+        if not missing:
+            continue
+
+        ids = list(missing.keys())
+        documents = list(missing.values())
+        embeddings = await create_openai_embeddings(documents) if embedding_type == "openai" else None
+        for idx in range(0, len(ids), CHROMA_ADD_BATCH_SIZE):
+            batch = slice(idx, idx + CHROMA_ADD_BATCH_SIZE)
+            collection.add(
+                ids=ids[batch],
+                documents=documents[batch],
+                embeddings=embeddings[batch] if embeddings else None,
+            )
 
 
 def get_urls_data(
@@ -137,17 +209,12 @@ def get_urls_data(
     """
     url_ids = wikipedia_urls_hashed()
     collection = get_or_create_collection(embedding_type=embedding_type)
-    data_to_get = {'ids': url_ids}
-    if data_type == "embeddings":
-        data_to_get['include'] = ['embeddings']
-
-    data = collection.get(**data_to_get)
+    data = collection.get(ids=url_ids, include=[data_type])
     mapping = wikipedia_urls_mapping()
-    match data_type:
-        case "embeddings":
-            return zip([mapping[id] for id in data["ids"]], data["embeddings"])
-        case "documents":
-            return zip([mapping[id] for id in data["ids"]], data["documents"])
+    # chromadb returns records in insertion order, they are put back in order of url_ids,
+    # so results (e.g. similarity pair labels) don't depend on the order urls were added in
+    items = dict(zip(data["ids"], data[data_type]))
+    return ((mapping[id], items[id]) for id in url_ids if id in items)
 
 
 def get_top5():
@@ -171,29 +238,24 @@ def get_top5():
         if not check_if_urls_in_collection(embedding_type=embedding_type):
             raise EmbeddingNotFoundException(f"Embedding type {embedding_type} not found in collection.")
 
-    results = []
-
     mapping = wikipedia_urls_mapping()
-    collection_openai = get_or_create_collection(embedding_type="openai")
-    collection_huggingface = get_or_create_collection(embedding_type="huggingface")
-    for id, url in mapping.items():
-        text = url.split('/')[-1].replace('_', ' ')
+    query_texts = [url.split('/')[-1].replace('_', ' ') for url in mapping.values()]
+
+    # one batched query per collection instead of one query (and embedding request) per url
+    top5_ids = {
+        embedding_type: get_or_create_collection(embedding_type=embedding_type).query(
+            query_texts=query_texts,
+            n_results=5
+        )["ids"]
+        for embedding_type in ("openai", "huggingface")
+    }
+
+    results = []
+    for idx, (url, text) in enumerate(zip(mapping.values(), query_texts)):
         results.append({
             "url": url,
             "query_text": text,
-            "openai_top5_results": [
-                mapping[id]
-                for id in collection_openai.query(
-                    query_texts=[text],
-                    n_results=5
-                )["ids"][0]
-            ],
-            "huggingface_top5_results": [
-                mapping[id]
-                for id in collection_huggingface.query(
-                    query_texts=[text],
-                    n_results=5
-                )["ids"][0]
-            ],
+            "openai_top5_results": [mapping[id] for id in top5_ids["openai"][idx]],
+            "huggingface_top5_results": [mapping[id] for id in top5_ids["huggingface"][idx]],
         })
     return results
@@ -1,12 +1,10 @@
-import pandas as pd
 import os
-import spacy
-import stanza
 import time
 from collections import Counter
+from itertools import chain
 from more_itertools import unzip
 from typing import TypeVar
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from app.api.embeddings import (
     check_if_urls_in_collection,
     get_urls_data,
@@ -17,6 +15,44 @@ from app.api.embeddings import (
 ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 FILE_PATH = os.path.join(ROOT_PATH, "data/nouns.csv")
 DVAL = TypeVar('DVAL', str, int)
+# POS tags of words taken into account when calculating frequencies
+NOUN_POS_TAGS = frozenset(("NOUN", "PROPN"))
+
+# NLP pipelines loaded once per worker process, see init_spacy and init_stanza
+_SPACY_NLP = None
+_STANZA_NLP = None
+
+
+def init_spacy() -> None:
+    """
+    Loads the SpaCy Polish language model into a module-global variable.
+
+    Called by the worker on its first spaCy task, so the model is loaded once per worker
+    process instead of once per document. Components not needed for lemmatization and
+    POS tagging are disabled.
+
+    :return: None
+    """
+    # heavy NLP libraries are imported only in processes which use them
+    import spacy
+
+    global _SPACY_NLP
+    _SPACY_NLP = spacy.load("pl_core_news_sm", disable=["parser", "ner"])
+
+
+def init_stanza() -> None:
+    """
+    Creates the Stanza Polish pipeline and stores it in a module-global variable.
+
+    Called by the worker on its first Stanza task, so the pipeline is created once per
+    worker process instead of once per document.
+
+    :return: None
+    """
+    import stanza
+
+    global _STANZA_NLP
+    _STANZA_NLP = stanza.Pipeline('pl', processors='tokenize,mwt,pos,lemma', download_method=None)
 
 
 def calculate_frequencies_per_document_stanza(url: str, document: str) -> list[dict[str, DVAL]]:
@@ -36,18 +72,17 @@ def calculate_frequencies_per_document_stanza(url: str, document: str) -> list[d
     t0 = time.perf_counter()
     print(f"Processing document {url} (stanza)...")
 
-    # Initialize Stanza pipeline
-    nlp = stanza.Pipeline('pl', processors='tokenize,mwt,pos,lemma', download_method=None)
+    if _STANZA_NLP is None:
+        init_stanza()
 
-    doc = nlp(document.lower())
+    doc = _STANZA_NLP(document)
 
-    # Get lemmas that match allowed POS tags and calculate frequencies
-    frequencies = Counter([
-        word.lemma.lower()
-        for sent in doc.sentences
-        for word in sent.words
-        if word.pos in ("NOUN", "PROPN") and word.lemma
-    ])
+    # Count lemmas that match allowed POS tags
+    frequencies = Counter()
+    for sent in doc.sentences:
+        for word in sent.words:
+            if word.pos in NOUN_POS_TAGS and word.lemma:
+                frequencies[word.lemma.lower()] += 1
 
     output = [
         {"url": url, 'noun': lemma, 'stanza': freq}
@@ -80,13 +115,14 @@ def calculate_frequencies_per_document_spacy(url: str, document: str) -> list[di
     t0 = time.perf_counter()
     print(f"Processing document {url} (spacy)...")
 
-    nlp = spacy.load("pl_core_news_sm")
-    doc = nlp(document.lower())
-    frequencies = Counter([
-        token.lemma_.lower()
-        for token in doc
-        if token.pos_ in ("NOUN", "PROPN")
-    ])
+    if _SPACY_NLP is None:
+        init_spacy()
+
+    doc = _SPACY_NLP(document)
+    frequencies = Counter()
+    for token in doc:
+        if token.pos_ in NOUN_POS_TAGS:
+            frequencies[token.lemma_.lower()] += 1
     output = [
         {"url": url, 'noun': lemma, 'spacy': freq}
         for lemma, freq in frequencies.items()
@@ -101,41 +137,46 @@ def calculate_frequencies_and_save_to_csv() -> None:
     """
     Calculates noun frequencies in documents using two NLP models (spaCy and Stanza),
     merges the results, and saves them to a CSV file. This function ensures that the
-    required embeddings are available, processes the documents in parallel, and outputs
-    merged results from both models into a single CSV file. The process measures and
-    prints the total time taken for computation.
+    required embeddings are available, processes the documents for both models in parallel
+    using a single process pool, and outputs merged results from both models into a single
+    CSV file, sorted by url and by frequencies in descending order. NLP models are loaded
+    once per worker process. The process measures and prints the total time taken for
+    computation.
 
     :raises EmbeddingNotFoundException: If the required embeddings are not present in
         the collection.
     :return: None
     """
+    import pandas as pd
+
     if not check_if_urls_in_collection(embedding_type="openai"):
         raise EmbeddingNotFoundException("Embedding type openai not found in collection")
     t0 = time.perf_counter()
     urls, docs = map(list, unzip(get_urls_data(data_type='documents', embedding_type="openai")))
-    with ProcessPoolExecutor() as executor:
-        results_spacy = executor.map(calculate_frequencies_per_document_spacy, urls, docs)
-    with ProcessPoolExecutor() as executor:
-        results_stanza = executor.map(calculate_frequencies_per_document_stanza, urls, docs)
-
-    output_spacy = {"url": [], "noun": [], "spacy": []}
-    for result in results_spacy:
-        for item in result:
-            output_spacy["url"].append(item["url"])
-            output_spacy["noun"].append(item["noun"])
-            output_spacy["spacy"].append(item["spacy"])
-    spacy_df = pd.DataFrame(output_spacy)
-
-    output_stanza = {"url": [], "noun": [], "stanza": []}
-    for result in results_stanza:
-        for item in result:
-            output_stanza["url"].append(item["url"])
-            output_stanza["noun"].append(item["noun"])
-            output_stanza["stanza"].append(item["stanza"])
-    stanza_df = pd.DataFrame(output_stanza)
+    results = {"spacy": [], "stanza": []}
+    # spacy and stanza tasks share one pool, so both models are processed at the same time
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {
+            executor.submit(calculate_frequencies_per_document_spacy, url, doc): "spacy"
+            for url, doc in zip(urls, docs)
+        }
+        futures.update({
+            executor.submit(calculate_frequencies_per_document_stanza, url, doc): "stanza"
+            for url, doc in zip(urls, docs)
+        })
+        for future in as_completed(futures):
+            results[futures[future]].append(future.result())
+
+    spacy_df = pd.DataFrame.from_records(
+        chain.from_iterable(results["spacy"]), columns=["url", "noun", "spacy"])
+    stanza_df = pd.DataFrame.from_records(
+        chain.from_iterable(results["stanza"]), columns=["url", "noun", "stanza"])
 
     merged = stanza_df.merge(spacy_df, on=["url", "noun"], how="outer").fillna(0)
-    merged.to_csv(FILE_PATH, index=False)
+    merged = merged.astype({"stanza": "int32", "spacy": "int32"})
+    # records are stored already sorted the way get_frequencies returns them
+    merged.sort_values(by=["url", "stanza", "spacy"], ascending=[True, False, False]).to_csv(
+        FILE_PATH, index=False)
 
     t = time.perf_counter() - t0
     print(f"NLP total processing time: {t:.2f}s")
@@ -149,10 +190,11 @@ def get_frequencies():
 
     The CSV file is expected to have the following columns:
     - `url`: The URL identifier (string).
-    - `stanza`: Frequency determined by a specific method, represented as integers.
-    - `spacy`: Frequency determined by another method, represented as integers.
-    All records are grouped by unique URLs, and the noun frequencies are sorted by
-    `stanza` and `spacy` values in descending order.
+    - `stanza`: Frequency determined by a specific method, represented as 32-bit integers.
+    - `spacy`: Frequency determined by another method, represented as 32-bit integers.
+    All records are grouped by unique URLs. The file is expected to be sorted by `url`
+    and then by `stanza` and `spacy` values in descending order, as written by
+    `calculate_frequencies_and_save_to_csv`, so no sorting is done per call.
 
     :return: A list of dictionaries containing grouped and sorted frequency records for
         unique URLs. Each dictionary has the following structure:
@@ -161,15 +203,14 @@ def get_frequencies():
           `spacy`.
     :rtype: list
     """
+    import pandas as pd
+
     frequencies_df = pd.read_csv(FILE_PATH)
-    frequencies_df["stanza"] = frequencies_df["stanza"].astype(int)
-    frequencies_df["spacy"] = frequencies_df["spacy"].astype(int)
-
-    output = []
-    for url in frequencies_df["url"].unique():
-        output.append({
-            "url": url,
-            "nouns": frequencies_df.loc[frequencies_df["url"] == url].iloc[:, 1:].sort_values(
-                by=["stanza", "spacy"], ascending=[False, False]).to_dict(orient="records")
-        })
-    return output
+    frequencies_df = frequencies_df.astype({"stanza": "int32", "spacy": "int32"})
+
+    # records are sorted when the file is saved, grouping keeps their order
+    grouped = frequencies_df.groupby("url", sort=False)
+    return [
+        {"url": url, "nouns": group.drop(columns="url").to_dict(orient="records")}
+        for url, group in grouped
+    ]
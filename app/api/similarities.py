@@ -1,7 +1,6 @@
+import numpy as np
 import pandas as pd
 import os
-from itertools import combinations
-from scipy.spatial import distance
 from typing import TypeVar
 from app.api.embeddings import (
     check_if_urls_in_collection,
@@ -12,7 +11,7 @@ from app.api.embeddings import (
 
 
 ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-FILE_PATH = os.path.join(ROOT_PATH, "data/similarities.csv")
+FILE_PATH = os.path.join(ROOT_PATH, "data/similarities.parquet")
 DVAL = TypeVar('DVAL', str, float)
 
 
@@ -42,21 +41,29 @@ def calculate_similarities(embedding_type: EmbeddingType) -> dict[str, list[DVAL
     if not check_if_urls_in_collection(embedding_type=embedding_type):
         raise EmbeddingNotFoundException(f"Embedding type {embedding_type} not found in collection")
 
-    embeddings = get_urls_data(data_type="embeddings", embedding_type=embedding_type)
-    for embedding1, embedding2 in combinations(embeddings, 2):
-        results[embedding_type].append(round(1 - distance.cosine(embedding1[1], embedding2[1]), 4))
-        results["urls"].append(f"{embedding1[0]} vs {embedding2[0]}")
+    urls, vectors = zip(*get_urls_data(data_type="embeddings", embedding_type=embedding_type))
+
+    # L2-normalized rows turn the whole pairwise cosine similarity matrix into a single matmul
+    embeddings = np.asarray(vectors, dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    similarities = embeddings @ embeddings.T
+
+    # upper triangle keeps the same pair order as itertools.combinations
+    idx1, idx2 = np.triu_indices(len(urls), k=1)
+    # rounded in float64, rounded float32 values would turn into float64 noise in tolist()
+    results[embedding_type] = np.round(similarities[idx1, idx2].astype(np.float64), 4).tolist()
+    results["urls"] = [f"{urls[i]} vs {urls[j]}" for i, j in zip(idx1, idx2)]
     return results
 
 
-def save_similarities_to_csv() -> None:
+def save_similarities_to_parquet() -> None:
     """
-    Save similarity scores computed using different embedding types to a CSV file.
+    Save similarity scores computed using different embedding types to a Parquet file.
 
     This function calculates similarity scores using two embedding types:
     OpenAI and HuggingFace. The function creates DataFrames for each,
-    merges them on the shared 'urls' field, and writes the result to a CSV file
-    after sorting by the OpenAI similarity scores.
+    merges them on the shared 'urls' field, and writes the result to a snappy
+    compressed Parquet file after sorting by the OpenAI similarity scores.
 
     :raises ValueError: Raised if the merge validation fails due to duplicate or
         mismatched rows.
@@ -68,20 +75,21 @@ def save_similarities_to_csv() -> None:
     huggingface = pd.DataFrame(similarities)
 
     merged = openai.merge(huggingface, on="urls", how='outer', validate="one_to_one")
-    merged.sort_values(by="openai", ascending=False).to_csv(FILE_PATH, index=False)
+    merged.sort_values(by="openai", ascending=False).to_parquet(
+        FILE_PATH, compression="snappy", index=False)
 
 
-def load_similarities_from_csv() -> list[dict[str, DVAL]]:
+def load_similarities_from_parquet() -> list[dict[str, DVAL]]:
     """
-    Loads similarity data from a CSV file and converts it into a list of dictionaries.
+    Loads similarity data from a Parquet file and converts it into a list of dictionaries.
 
-    This function reads the content of a CSV file specified in the global `FILE_PATH`
-    variable, parses it into a Pandas DataFrame, and transforms the DataFrame into a
-    list of dictionaries. Each dictionary represents a row in the CSV file, with
+    This function reads the content of a Parquet file specified in the global `FILE_PATH`
+    variable into a Pandas DataFrame, and transforms the DataFrame into a
+    list of dictionaries. Each dictionary represents a row in the file, with
     keys being the column names and values being the corresponding field values.
 
     :return: List of dictionaries where each dictionary corresponds to a row in the
-        CSV file. The keys of the dictionaries are the column names in the CSV file.
+        Parquet file. The keys of the dictionaries are the column names in the file.
     :rtype: list[dict[str, DVAL]]
     """
-    return pd.read_csv(FILE_PATH).to_dict(orient="records")
+    return pd.read_parquet(FILE_PATH).to_dict(orient="records")
@@ -1,8 +1,14 @@
-from aiohttp import ClientSession
-from bs4 import BeautifulSoup
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from lxml import etree
 import asyncio
 import hashlib
+import lxml.html
+import orjson
+import os
 import re
+from typing import NamedTuple
 
 
 WIKIPEDIA_URLS = (
@@ -29,6 +35,131 @@ WIKIPEDIA_URLS = (
 )
 
 
+def hash_url(url: str) -> str:
+    """
+    :param url: The URL to hash.
+    :return: 8 character SHAKE-256 hash of the URL, used as its id in chromadb collections.
+    """
+    return hashlib.shake_256(url.encode('utf-8')).hexdigest(8)
+
+
+class HashedUrl(NamedTuple):
+    """
+    URL together with its hash, see `hash_url`.
+    """
+    url: str
+    url_hashed: str
+
+
+# WIKIPEDIA_URLS is constant, so their hashes are calculated once at import
+WIKIPEDIA_HASHED_URLS = tuple(HashedUrl(url, hash_url(url)) for url in WIKIPEDIA_URLS)
+_WIKIPEDIA_URLS_HASHED = [hashed_url.url_hashed for hashed_url in WIKIPEDIA_HASHED_URLS]
+_WIKIPEDIA_URLS_MAPPING = {hashed_url.url_hashed: hashed_url.url for hashed_url in WIKIPEDIA_HASHED_URLS}
+_WIKIPEDIA_HASHED_URLS_BY_URL = {hashed_url.url: hashed_url for hashed_url in WIKIPEDIA_HASHED_URLS}
+
+
+# Tags and page chrome (site header, menus, footer) which never belong to article content
+NON_CONTENT_TAGS = (etree.Comment, 'script', 'style', 'noscript', 'template', 'header', 'footer')
+NAVIGATION_XPATH = etree.XPath('//*[@id="mw-navigation" or @id="mw-head" or @id="mw-panel" or @id="footer"]')
+# Maximum number of pages fetched and parsed concurrently by urls_fetcher
+MAX_CONCURRENT_FETCHES = 8
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Cleaned texts of fetched pages with their ETag / Last-Modified headers, one JSON file per url hash
+CACHE_PATH = os.path.join(ROOT_PATH, "cache")
+# Version of the text extraction stored with cached texts, to be increased on every change of
+# `parse_website_content` output, so texts extracted by its previous versions are not served from cache
+CACHE_VERSION = 2
+# Threads parsing fetched pages, lxml releases the GIL while parsing so pages can be parsed in parallel
+PARSE_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+# Number of leading characters of page text searched for the article start sentinel
+ARTICLE_START_SEARCH_LIMIT = 16384
+# Ids of headings of the first sections following the article content
+END_SECTION_IDS = frozenset(('Zobacz_też', 'Przypisy', 'Bibliografia', 'Linki_zewnętrzne'))
+# XPath predicate matching elements with the given class among their classes
+HAS_CLASS = 'contains(concat(" ", normalize-space(@class), " "), " {} ")'
+# XPath expressions used to extract the article content, compiled once instead of on every call
+ARTICLE_XPATH = etree.XPath(f'//div[@id="mw-content-text"]//div[{HAS_CLASS.format("mw-parser-output")}]')
+NOISE_XPATH = etree.XPath(f'.//*[{HAS_CLASS.format("mw-editsection")} or {HAS_CLASS.format("reference")}]')
+NAVBOX_XPATH = etree.XPath(f'descendant-or-self::*[{HAS_CLASS.format("navbox")}]')
+IDS_XPATH = etree.XPath('descendant-or-self::*/@id')
+# Markers of the first section after the article content, found with a single search in text of pages
+# without the standard article content container
+SECTIONS_RE = re.compile('|'.join(re.escape(section) for section in (
+    ' Zobacz też [ edytuj | edytuj kod ]',
+    ' Przypisy [ edytuj | edytuj kod ]',
+    ' Bibliografia [ edytuj | edytuj kod ]',
+    ' Linki zewnętrzne [ edytuj | edytuj kod ]',
+    ' p d e ',
+    ' Kontrola autorytatywna ( osoba ):'
+)))
+# Removes edit links and citation marks in a single pass, e.g. '[ edytuj | edytuj kod ] ' and ' [ 12 ]'.
+# Edit links directly before a citation mark are matched together with it, because removing the link
+# moves the citation mark next to the preceding space.
+CLEANUP_RE = re.compile(r' (?:\[ edytuj \| edytuj kod \] )*\[ \d+ \]|\[ edytuj \| edytuj kod \] ')
+
+
+def create_client_session() -> ClientSession:
+    """
+    Creates an aiohttp.ClientSession tuned for fetching many pages from a single host: the number of
+    connections per host is capped, DNS lookups are cached and every request has a total timeout.
+
+    :return: A new aiohttp.ClientSession, to be closed by the caller.
+    """
+    connector = TCPConnector(
+        limit=32,
+        limit_per_host=8,
+        use_dns_cache=True,
+        ttl_dns_cache=600,
+    )
+    return ClientSession(connector=connector, timeout=ClientTimeout(total=30))
+
+
+def extract_text(element: lxml.html.HtmlElement) -> str:
+    """
+    Extracts text from a parsed HTML element, equivalent to BeautifulSoup's ``get_text(separator=" ", strip=True)``:
+    every text node is stripped, empty ones are skipped and the rest is joined with single spaces.
+
+    :param element: The parsed HTML element.
+    :return: Text content of the element.
+    """
+    return " ".join(text for text in (node.strip() for node in element.itertext()) if text)
+
+
+def is_article_end(element: lxml.html.HtmlElement) -> bool:
+    """
+    :param element: A direct child element of the article content.
+    :return: True if the element starts the part of the page following the article content, that is
+    a heading of one of END_SECTION_IDS sections or a navigation box.
+    """
+    if NAVBOX_XPATH(element):
+        return True
+    if element.tag == 'h2' or 'mw-heading' in element.get('class', '').split():
+        return not END_SECTION_IDS.isdisjoint(IDS_XPATH(element))
+    return False
+
+
+def extract_article(root: lxml.html.HtmlElement) -> lxml.html.HtmlElement | None:
+    """
+    Finds the article content of a parsed Wikipedia page and removes from it edit links, references marks and
+    everything starting from the first section following the article (see `is_article_end`).
+
+    :param root: The parsed HTML page.
+    :return: The cleaned article content element, or None if the page has no article content.
+    """
+    articles = ARTICLE_XPATH(root)
+    if not articles:
+        return None
+    article = articles[0]
+
+    for element in NOISE_XPATH(article):
+        element.drop_tree()
+    article_end = next((child for child in article if is_article_end(child)), None)
+    if article_end is not None:
+        for element in [article_end, *article_end.itersiblings()]:
+            article.remove(element)
+    return article
+
+
 def preprocess_website_content(content: str) -> str:
     """
     :param content: The raw HTML or text content of a Wikipedia page that needs preprocessing.
@@ -36,46 +167,98 @@ def preprocess_website_content(content: str) -> str:
     and references removed.
     """
     text = 'Z Wikipedii, wolnej encyklopedii '
-    idx_start = content.index(text) + len(text)
-
-    idx_end = len(content)
-    sections = (
-        ' Zobacz też [ edytuj | edytuj kod ]',
-        ' Przypisy [ edytuj | edytuj kod ]',
-        ' Bibliografia [ edytuj | edytuj kod ]',
-        ' Linki zewnętrzne [ edytuj | edytuj kod ]',
-        ' p d e ',
-        ' Kontrola autorytatywna ( osoba ):'
-    )
-    for section in sections:
-        if section in content:
-            idx_end = content.index(section)
-            break
-    return re.sub(
-        r' \[ \d+ \]',
-        r'',
-        content[idx_start:idx_end].replace('[ edytuj | edytuj kod ] ', '')
-    )
+    # sentinel follows just the page title, there is no need to scan the whole page for it
+    idx_start = content.index(text, 0, ARTICLE_START_SEARCH_LIMIT) + len(text)
 
+    # article ends at the first section marker found after its start
+    section_match = SECTIONS_RE.search(content, idx_start)
+    idx_end = section_match.start() if section_match else len(content)
+    return CLEANUP_RE.sub('', content[idx_start:idx_end])
 
-async def fetch_and_extract_text(session: ClientSession, url: str) -> tuple[str, str]:
+
+def parse_website_content(html_content: str | bytes) -> str:
+    """
+    Extracts the article text from a Wikipedia page using its structure, see `extract_article`. Pages without
+    the standard article content container fall back to text based `preprocess_website_content`.
+
+    :param html_content: The raw HTML content of a Wikipedia page, as text or undecoded bytes.
+    :return: Cleaned text of the article.
+    """
+    root = lxml.html.fromstring(html_content)
+    etree.strip_elements(root, *NON_CONTENT_TAGS, with_tail=False)
+
+    article = extract_article(root)
+    if article is not None:
+        return extract_text(article)
+
+    for element in NAVIGATION_XPATH(root):
+        element.drop_tree()
+    return preprocess_website_content(extract_text(root))
+
+
+def load_cached_content(url_hashed: str) -> dict[str, str | None] | None:
+    """
+    :param url_hashed: Hash of the URL, see `hash_url`.
+    :return: A dict with `etag`, `last_modified` and `text` keys stored for the URL, or None if it is not cached
+    or it was cached with a different CACHE_VERSION.
+    """
+    try:
+        with open(os.path.join(CACHE_PATH, f"{url_hashed}.json"), 'rb') as cache_file:
+            cached = orjson.loads(cache_file.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    return cached if cached.get('version') == CACHE_VERSION else None
+
+
+def save_cached_content(url_hashed: str, etag: str | None, last_modified: str | None, text: str) -> None:
+    """
+    :param url_hashed: Hash of the URL, see `hash_url`.
+    :param etag: ETag header of the response the text was extracted from.
+    :param last_modified: Last-Modified header of the response the text was extracted from.
+    :param text: Extracted/preprocessed text content of the URL.
+    """
+    os.makedirs(CACHE_PATH, exist_ok=True)
+    # orjson encodes straight to UTF-8 bytes, without an intermediate str of the whole document
+    with open(os.path.join(CACHE_PATH, f"{url_hashed}.json"), 'wb') as cache_file:
+        cache_file.write(orjson.dumps(
+            {'version': CACHE_VERSION, 'etag': etag, 'last_modified': last_modified, 'text': text}
+        ))
+
+
+async def fetch_and_extract_text(session: ClientSession, url: str, url_hashed: str) -> tuple[str, str]:
     """
     :param session: An instance of aiohttp.ClientSession used for making asynchronous HTTP requests.
     :param url: The target URL from which to fetch and extract the textual content.
-    :return: A tuple containing a hashed representation of the URL and the extracted/preprocessed text content,
-    or an error message if the operation fails.
+    :param url_hashed: Hash of the URL, see `hash_url`, also used as a key of cached content.
+    :return: A tuple containing the given hashed representation of the URL and the extracted/preprocessed text
+    content, or an error message if the operation fails.
     """
+    # conditional request for cached pages, unchanged pages are answered with 304 and are not parsed again
+    # cache files are read and written in threads, not to block the event loop
+    cached = await asyncio.to_thread(load_cached_content, url_hashed)
+    headers = {}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+
     try:
-        async with session.get(url) as response:
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and cached:
+                return url_hashed, cached['text']
             # Ensure the HTTP request is successful
             if response.status == 200:
-                html_content = await response.text()
+                # lxml decodes raw bytes itself, using the charset declared by the page
+                html_content = await response.read()
 
-                # Parse the HTML to extract text
-                soup = BeautifulSoup(html_content, 'html.parser')
-                text_content = soup.get_text(separator=" ", strip=True)
-                text_content = preprocess_website_content(text_content)
-                url_hashed = hashlib.shake_256(url.encode('utf-8')).hexdigest(8)
+                # Parse the HTML to extract text, in a thread so the event loop can handle other fetches
+                text_content = await asyncio.get_running_loop().run_in_executor(
+                    PARSE_EXECUTOR, parse_website_content, html_content
+                )
+                await asyncio.to_thread(
+                    save_cached_content,
+                    url_hashed, response.headers.get('ETag'), response.headers.get('Last-Modified'), text_content
+                )
 
                 return url_hashed, text_content
             else:
@@ -85,54 +268,70 @@ async def fetch_and_extract_text(session: ClientSession, url: str) -> tuple[str,
         return f"An error occurred: {str(e)}"
 
 
-async def urls_fetcher(urls: list) -> dict[str, str]:
+async def urls_fetcher(urls: list, session: ClientSession | None = None) -> dict[str, str]:
     """
-    Fetches urls and extracts their text content.
+    Fetches urls and extracts their text content, at most MAX_CONCURRENT_FETCHES urls at a time.
     
     :param urls: A list of URLs to fetch content from.
-    :return: A dict with url hashes as keys and relevant extracted text contents for each URL as values.
+    :param session: An optional long-lived aiohttp.ClientSession to reuse its connection pool. If not given,
+    a new session from `create_client_session` is created and closed for this call only.
+    :return: A dict with url hashes as keys and relevant extracted text contents for each URL as values,
+    in order of the given urls.
     """
     final_response = {}
-    async with ClientSession() as session:
-        tasks = []
-        for url in urls:
-            task = asyncio.create_task(fetch_and_extract_text(session, url))
-            tasks.append(task)
-        for hashed, content in await asyncio.gather(*tasks):
+    # a session owned by the caller is reused and left open
+    async with nullcontext(session) if session else create_client_session() as session:
+        # caps the number of pages downloaded and parsed at the same time
+        semaphore = asyncio.BoundedSemaphore(MAX_CONCURRENT_FETCHES)
+
+        async def fetch_with_limit(hashed_url: HashedUrl) -> tuple[str, str]:
+            async with semaphore:
+                return await fetch_and_extract_text(session, hashed_url.url, hashed_url.url_hashed)
+
+        # all urls are hashed upfront, wikipedia urls hashes are already precomputed
+        hashed_urls = [
+            _WIKIPEDIA_HASHED_URLS_BY_URL.get(url) or HashedUrl(url, hash_url(url))
+            for url in urls
+        ]
+        # results are stored as soon as each page is ready, not after all pages are fetched
+        for fetched in asyncio.as_completed([fetch_with_limit(hashed_url) for hashed_url in hashed_urls]):
+            hashed, content = await fetched
             final_response[hashed] = content
-    return final_response
+    # input order is kept, it is the order in which documents are added to chromadb collections
+    return {hashed_url.url_hashed: final_response[hashed_url.url_hashed] for hashed_url in hashed_urls}
 
 
-async def wikipedia_urls_fetcher():
+async def wikipedia_urls_fetcher(session: ClientSession | None = None):
     """
     Asynchronously fetches URLs from the WIKIPEDIA_URLS source.
 
     This function utilizes `urls_fetcher` to retrieve the list of URLs defined in the WIKIPEDIA_URLS constant.
 
+    :param session: An optional long-lived aiohttp.ClientSession passed to `urls_fetcher`.
     :return: A list of fetched URLs from WIKIPEDIA_URLS.
     """
-    return await urls_fetcher(WIKIPEDIA_URLS)
+    return await urls_fetcher(WIKIPEDIA_URLS, session=session)
 
 
-def wikipedia_urls_hashed():
+def wikipedia_urls_hashed() -> list[str]:
     """
-    Generates a list of hashed values for URLs stored in the WIKIPEDIA_URLS constant.
+    Returns a list of hashed values for URLs stored in the WIKIPEDIA_URLS constant.
 
     The URLs are hashed using the SHAKE-256 algorithm, and each hash is truncated to 8 characters.
+    Hashes are precomputed at import, as WIKIPEDIA_URLS is constant, and the returned list must not be modified.
 
     :return: A list of 8 character SHAKE-256 hash strings for each URL in WIKIPEDIA_URLS.
     """
-    return [hashlib.shake_256(url.encode('utf-8')).hexdigest(8) for url in WIKIPEDIA_URLS]
+    return _WIKIPEDIA_URLS_HASHED
 
 
 def wikipedia_urls_mapping() -> dict[str, str]:
     """
     Maps hashed Wikipedia URLs to their corresponding original URLs.
 
-    This function utilizes the `wikipedia_urls_hashed` function, which generates hashed versions of Wikipedia URLs,
-    and the predefined `WIKIPEDIA_URLS` list.
-    It creates a dictionary mapping each hashed URL to its original URL by zipping the two sequences together.
+    The mapping is built at import from the precomputed hashes of the predefined `WIKIPEDIA_URLS` list,
+    and the returned dictionary must not be modified.
 
     :return: A dictionary where keys are hashed versions of Wikipedia URLs and values are the corresponding original URLs.
     """
-    return dict(zip(wikipedia_urls_hashed(), WIKIPEDIA_URLS))
+    return _WIKIPEDIA_URLS_MAPPING
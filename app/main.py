@@ -5,6 +5,8 @@ from app.routers import router
 def init_app():
     server = FastAPI(title="FastAPI stats server")
     server.include_router(router)
+    # OpenAPI schema is built and cached at startup instead of on the first docs request
+    server.openapi()
 
     return server
 
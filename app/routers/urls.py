@@ -1,7 +1,9 @@
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Response, status
+import asyncio
+import orjson
 from app.api.embeddings import get_top5
 from app.api.nouns import get_frequencies
-from app.api.similarities import load_similarities_from_csv
+from app.api.similarities import load_similarities_from_parquet
 from app.schemas.urls import FinalResponse
 
 
@@ -11,20 +13,33 @@ urls_router = APIRouter()
 @urls_router.get(
     "/get-stats",
     status_code=status.HTTP_200_OK,
-    response_model=FinalResponse
+    # schema is only documented, response data is not re-validated on every request
+    responses={status.HTTP_200_OK: {"model": FinalResponse}}
 )
 async def get_stats():
     """
     Handles the retrieval of statistical data used for analysis purposes.
     The function collects and processes top 5 ChromaDB results, similarity
-    metrics from a CSV file, and word frequency data.
+    metrics from a Parquet file, and word frequency data. The three parts are collected
+    concurrently in worker threads, so the event loop is not blocked. The data is serialized with orjson
+    directly, following the `FinalResponse` schema.
 
-    :return: A dictionary containing three keys: `chromadb_top5`, `similarities`,
+    :return: A JSON response containing three keys: `chromadb_top5`, `similarities`,
         and `nouns`. Each key holds the corresponding processed data.
-    :rtype: dict
+    :rtype: Response
     """
-    return {
-        "chromadb_top5": get_top5(),
-        "similarities": load_similarities_from_csv(),
-        "nouns": get_frequencies()
-    }
+    # blocking chromadb queries and file reads are independent, they run concurrently in threads
+    # to keep the event loop free
+    chromadb_top5, similarities, nouns = await asyncio.gather(
+        asyncio.to_thread(get_top5),
+        asyncio.to_thread(load_similarities_from_parquet),
+        asyncio.to_thread(get_frequencies),
+    )
+    return Response(
+        content=orjson.dumps({
+            "chromadb_top5": chromadb_top5,
+            "similarities": similarities,
+            "nouns": nouns
+        }),
+        media_type="application/json"
+    )
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field
 
 
 class Similarity(BaseModel):
@@ -32,13 +32,13 @@ class Noun(BaseModel):
     :ivar noun: Noun extracted from website content.
     :type noun: str
     :ivar stanza: Frequency of the noun calculated using the Stanza NLP pipeline.
-    :type stanza: float
+    :type stanza: int
     :ivar spacy: Frequency of the noun calculated using the SpaCy NLP pipeline.
-    :type spacy: float
+    :type spacy: int
     """
     noun: str = Field(..., description="Noun extracted from website content")
-    stanza: float = Field(..., description="Frequency of nouns calculated using Stanza NLP pipeline")
-    spacy: float = Field(..., description="Frequency of nouns calculated using Spacy NLP pipeline")
+    stanza: int = Field(..., description="Frequency of nouns calculated using Stanza NLP pipeline")
+    spacy: int = Field(..., description="Frequency of nouns calculated using Spacy NLP pipeline")
 
 
 class Nouns(BaseModel):
@@ -68,18 +68,18 @@ class ChromaSearch(BaseModel):
     for various information retrieval tasks and comparative search analysis.
 
     :ivar url: URL of the content that serves as the basis for comparison in text search.
-    :type url: HttpUrl
+    :type url: str
     :ivar query_text: Text query that specifies the search criteria, the last part of a URL.
     :type query_text: str
     :ivar openai_top5_results: List of top 5 search results retrieved using OpenAI embeddings.
-    :type openai_top5_results: list[HttpUrl]
+    :type openai_top5_results: list[str]
     :ivar huggingface_top5_results: List of top 5 search results retrieved using HuggingFace embeddings.
-    :type huggingface_top5_results: list[HttpUrl]
+    :type huggingface_top5_results: list[str]
     """
-    url: HttpUrl = Field(..., description="URL of content used for comparison")
+    url: str = Field(..., description="URL of content used for comparison")
     query_text: str = Field(..., description="Text to search for - last part of url")
-    openai_top5_results: list[HttpUrl] = Field(..., description="Search based on OpenAI embeddings")
-    huggingface_top5_results: list[HttpUrl] = Field(..., description="Search based on HuggingFace embeddings")
+    openai_top5_results: list[str] = Field(..., description="Search based on OpenAI embeddings")
+    huggingface_top5_results: list[str] = Field(..., description="Search based on HuggingFace embeddings")
 
 
 class FinalResponse(BaseModel):
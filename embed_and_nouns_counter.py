@@ -2,7 +2,7 @@ import asyncio
 import typer
 from app.api.embeddings import create_embeddings
 from app.api.nouns import calculate_frequencies_and_save_to_csv
-from app.api.similarities import save_similarities_to_csv
+from app.api.similarities import save_similarities_to_parquet
 
 app = typer.Typer()
 
@@ -17,7 +17,7 @@ def create_embeddings_collections() -> None:
 @app.command()
 def calculate_and_save_similarities() -> None:
     typer.echo("Starting calculations...")
-    save_similarities_to_csv()
+    save_similarities_to_parquet()
     typer.echo("Done!")
 
 